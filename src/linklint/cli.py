@@ -1,23 +1,94 @@
 import argparse
+import functools
+import os
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable
 
-from linklint.linklint import CHECKS, LintIssue, lint_content
+from linklint.linklint import CHECKS, LintIssue, LintResult, lint_content
+from linklint.rsthelp import warmup_parser
 from linklint.utils import plural
 
 
-def lint_file(filepath: str, fix: bool, checks: set[str]) -> list[LintIssue]:
+def lint_file(filepath: str, fix: bool, checks: Iterable[str]) -> LintResult:
     """Lint a single RST file.
 
-    Returns a list of LintIssue objects.
+    Returns a LintResult. Fixed content isn't written: lint_files does that.
     """
     # print(filepath)
-    path = Path(filepath)
-    content = path.read_text(encoding="utf-8")
-    result = lint_content(content, fix, checks)
-    if fix and result.fixed:
-        path.write_text(result.content, encoding="utf-8")
-    return result.issues
+    content = Path(filepath).read_text(encoding="utf-8")
+    return lint_content(content, fix, checks)
+
+
+def init_worker(workdir: str) -> None:
+    """Set up a worker process, with its own directory for Sphinx."""
+    warmup_parser(tempfile.mkdtemp(dir=workdir))
+
+
+def lint_files(
+    filepaths: list[str], fix: bool, checks: Iterable[str], jobs: int
+) -> Iterable[tuple[str, list[LintIssue]]]:
+    """Lint a number of RST files, using `jobs` processes.
+
+    Yields (filepath, issues) pairs, in the same order as `filepaths`.
+    """
+    # Lint a file named more than once only once, however it's spelled: it's
+    # quicker, and two processes won't try to fix the same file.
+    realpaths = {filepath: os.path.realpath(filepath) for filepath in filepaths}
+    # The first spelling of each file, by its real path.
+    unique: dict[str, str] = {}
+    for filepath in filepaths:
+        unique.setdefault(realpaths[filepath], filepath)
+    results: dict[str, list[LintIssue]] = {}
+    position = 0
+    for filepath, result in lint_unique_files(list(unique.values()), fix, checks, jobs):
+        if fix and result.fixed:
+            # Write the fixes here, in order, rather than in the processes: if a
+            # file fails, none of the files after it have been changed.
+            Path(filepath).write_text(result.content, encoding="utf-8")
+        results[realpaths[filepath]] = result.issues
+        # Yield all the files we can, up to the next one not linted yet.
+        while position < len(filepaths) and realpaths[filepaths[position]] in results:
+            filepath = filepaths[position]
+            realpath = realpaths[filepath]
+            yield filepath, results[realpath]
+            # If the file was fixed, naming it again would only find what couldn't be fixed.
+            results[realpath] = [issue for issue in results[realpath] if not issue.fixed]
+            position += 1
+
+
+def lint_unique_files(
+    filepaths: list[str], fix: bool, checks: Iterable[str], jobs: int
+) -> Iterable[tuple[str, LintResult]]:
+    """Lint distinct RST files, using `jobs` processes."""
+    linter = functools.partial(lint_file, fix=fix, checks=checks)
+    # More processes than files would only start Sphinx for nothing.
+    jobs = min(jobs, len(filepaths))
+    if jobs <= 1:
+        warmup_parser()
+        yield from zip(filepaths, map(linter, filepaths))
+        return
+
+    # Parsing is CPU-bound and each file is independent, so spread the files
+    # over a number of processes, each with its own Sphinx application.
+    chunksize = max(1, len(filepaths) // (jobs * 4))
+    with (
+        tempfile.TemporaryDirectory(prefix="linklint-") as workdir,
+        ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(workdir,)) as executor,
+    ):
+        yield from zip(filepaths, executor.map(linter, filepaths, chunksize=chunksize))
+
+
+def cpu_count() -> int:
+    """How many CPUs can this process use?"""
+    if sys.version_info >= (3, 13):
+        # This respects CPU affinity and the -X cpu_count option.
+        cpus = os.process_cpu_count()
+    else:
+        cpus = os.cpu_count()
+    return cpus or 1
 
 
 def linklint(argv: list[str]) -> int:
@@ -28,29 +99,47 @@ def linklint(argv: list[str]) -> int:
         default="all",
     )
     parser.add_argument("--fix", help="Fix the issues in place", action="store_true")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="number of processes to use (default: number of CPUs)",
+        type=int,
+        default=cpu_count(),
+    )
     parser.add_argument("files", nargs="+", help="RST files to lint")
     args = parser.parse_args(argv)
 
-    checks = set(args.check.split(","))
-    unknown = checks - set(CHECKS.keys()) - {"all"}
+    requested = set(args.check.split(","))
+    unknown = requested - set(CHECKS.keys()) - {"all"}
     if unknown:
         print(f"Unknown checks: {', '.join(unknown)}", file=sys.stderr)
         return 2
-    if "all" in checks:
-        checks = set(CHECKS.keys())
+    if "all" in requested:
+        requested = set(CHECKS.keys())
+    # Settle the checks once, in the order they are defined, so that every
+    # file runs them the same way, and issues are reported in a stable order.
+    checks = [name for name in CHECKS if name in requested]
+
+    if args.jobs < 1:
+        print("--jobs must be at least 1", file=sys.stderr)
+        return 2
 
     issues = 0
     fixed = 0
-    for filepath in args.files:
-        # This runs Sphinx on each file separately, which seems slow, but is
-        # faster than running it once on all the files.
-        for issue in lint_file(filepath, args.fix, checks):
+    for filepath, file_issues in lint_files(args.files, args.fix, checks, args.jobs):
+        # Write each file's issues all at once, rather than a print per issue.
+        out = []
+        for issue in file_issues:
             fixed_suffix = ""
             if issue.fixed:
                 fixed_suffix = " (fixed)"
                 fixed += 1
-            print(f"{filepath}:{issue.line}: {issue.message}{fixed_suffix}")
+            out.append(f"{filepath}:{issue.line}: {issue.message}{fixed_suffix}\n")
+            # Notes come back from the processes with the issues, so they're
+            # shown here with the right file, not printed by the processes.
+            out.extend(f"{filepath}:{issue.line}: {note}\n" for note in issue.notes)
             issues += 1
+        sys.stdout.write("".join(out))
 
     summary = f"Checked {plural(len(args.files), 'file')}, found {plural(issues, 'issue')}"
     if args.fix:
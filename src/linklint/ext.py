@@ -1,5 +1,5 @@
 from collections import Counter
-from typing import cast
+from typing import Iterable, cast
 
 from docutils import nodes
 from sphinx.application import Sphinx
@@ -8,7 +8,7 @@ from sphinx.util import logging
 from sphinx.util.typing import ExtensionMetadata
 
 import linklint
-from linklint.linklint import find_duplicate_refs, find_self_refs
+from linklint.linklint import find_duplicate_refs, find_self_refs, paragraph_refs
 
 logger = logging.getLogger(__name__)
 
@@ -18,9 +18,13 @@ def init_data(app: Sphinx) -> None:
     app.env.linklint_counts = {}  # type: ignore
 
 
+def find_paragraph_duplicate_refs(doctree: nodes.document) -> Iterable[nodes.Node]:
+    return find_duplicate_refs(paragraph_refs(doctree))
+
+
 FINDERS = [
     (find_self_refs, "self"),
-    (find_duplicate_refs, "duplicate"),
+    (find_paragraph_duplicate_refs, "duplicate"),
 ]
 
 
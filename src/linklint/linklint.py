@@ -1,6 +1,7 @@
 """Linter to find link problems in RST files."""
 
 import collections
+import functools
 import re
 from collections import defaultdict
 from dataclasses import dataclass
@@ -9,8 +10,8 @@ from typing import Iterable
 from docutils import nodes
 from sphinx import addnodes
 
-from linklint.regions import Region, find_regions
-from linklint.rsthelp import parse_rst, resub_in_rst_line
+from linklint.regions import Region, find_regions, section_module
+from linklint.rsthelp import parse_rst, replace_in_rst_line, resub_in_rst_line
 from linklint.utils import node_line_number, node_traceback
 
 
@@ -42,46 +43,84 @@ class Resolver:
     for objtype, names in object_types.items():
         for name in names:
             reftype_to_objtype[name].append(objtype)
+    # Done building: a plain dict of tuples, so nothing can add to it by accident.
+    reftype_to_objtype = {
+        reftype: tuple(objtypes) for reftype, objtypes in reftype_to_objtype.items()
+    }
 
     def __init__(self, doctree: nodes.document) -> None:
         self.region_map = {(r.kind, r.name): r for r in find_regions(doctree)}
 
+        # Expand each region under every reftype that can refer to it, so that
+        # finding a region is a single lookup. Objtypes earlier in the list
+        # for a reftype take priority, so fill them in last.
+        regions_by_kind = collections.defaultdict(list)
+        for (kind, name), region in self.region_map.items():
+            regions_by_kind[kind].append((name, region))
+        self.ref_map: dict[tuple[str, str], Region] = {}
+        for reftype, objtypes in self.reftype_to_objtype.items():
+            for objtype in reversed(objtypes):
+                for name, region in regions_by_kind.get(objtype, ()):
+                    self.ref_map[(reftype, name)] = region
+        # The reftypes that can refer to anything in this document.
+        self.reftypes = {reftype for reftype, _ in self.ref_map}
+
     def find_region(self, reftype: str, target: str) -> Region | None:
-        for objtype in self.reftype_to_objtype[reftype]:
-            region = self.region_map.get((objtype, target))
-            if region is not None:
-                return region
-        return None
+        return self.ref_map.get((reftype, target))
 
 
-@dataclass
+@dataclass(slots=True)
 class LintIssue:
     line: int
     message: str
     fixed: bool = False
+    # More lines to show with the issue, like why it couldn't be fixed.
+    notes: tuple[str, ...] = ()
 
 
 @dataclass
 class LintWork:
     doctree: nodes.document
+    # The lines of the content, to be changed in place. Only split when fixing.
     content_lines: list[str]
     fix: bool
     fixed: bool
 
+    @functools.cached_property
+    def resolver(self) -> Resolver:
+        """A Resolver for the doctree, made once for all the checks that need it."""
+        return Resolver(self.doctree)
+
+    @functools.cached_property
+    def para_refs(self) -> dict[nodes.paragraph, list[addnodes.pending_xref]]:
+        """The references in each paragraph, from paragraph_refs()."""
+        return paragraph_refs(self.doctree)
+
 
 CHECKS = {}
+# For each check, a pattern that content must match for the check to find
+# anything in it. Content that can't have issues isn't parsed at all.
+PREFILTERS: dict[str, re.Pattern[str]] = {}
 
 
-def check(name: str):
+def check(name: str, prefilter: re.Pattern[str]):
     """Decorator to register a lint check function."""
 
     def decorator(func):
         CHECKS[name] = func
+        PREFILTERS[name] = prefilter
         return func
 
     return decorator
 
 
+# A directive: it could declare a module or object, or include other content.
+# Directives can start mid-line, in list items and table cells, so don't anchor.
+DIRECTIVE_RE = re.compile(r"\.\.\s+\S+ ?::")
+# A role, or a directive which could make references in signatures or fields.
+REFERENCE_RE = re.compile(r"`|\.\.\s+\S+ ?::")
+
+
 # pat/repl pairs for references styles.
 REF_FIXES = [
     (
@@ -96,41 +135,68 @@ REF_FIXES = [
     ),
 ]
 
+
+@functools.lru_cache(maxsize=4096)
+def ref_fixes(reftype: str, target: str) -> tuple[tuple[re.Pattern[str], str], ...]:
+    """Get compiled pat/repl pairs from REF_FIXES for one reference."""
+    escaped = re.escape(target)
+    return tuple(
+        (
+            re.compile(pat.format(reftype=reftype, target=escaped)),
+            repl.format(reftype=reftype, target=target),
+        )
+        for pat, repl in REF_FIXES
+    )
+
+
 # Sphinx roles that are explicit references elsewhere and should always be links.
 ALWAYS_REF = {"doc", "download", "numref", "ref"}
 
 
-@check("self")
+@check("self", prefilter=DIRECTIVE_RE)
 def check_self_links(work: LintWork) -> Iterable[LintIssue]:
-    for ref in find_self_refs(work.doctree):
+    for ref in find_self_refs(work.doctree, work.resolver):
         line = node_line_number(ref)
         reftype = ref.get("reftype")  # type: ignore
         target = ref.get("reftarget")  # type: ignore
         fixed = False
+        notes = ()
         if work.fix:
-            for pat, repl in REF_FIXES:
-                fixed = resub_in_rst_line(
-                    lines=work.content_lines,
-                    line_num=line - 1,
-                    pat=pat.format(reftype=reftype, target=re.escape(target)),
-                    repl=repl.format(reftype=reftype, target=target),
-                    count=1,
-                )
-                if fixed:
-                    break
+            # The common forms of the reference can be fixed without a regex.
+            fixed = replace_in_rst_line(
+                lines=work.content_lines,
+                line_num=line - 1,
+                olds=[f":{reftype}:`{prefix}{target}`" for prefix in ["", "~", "."]],
+                new=f":{reftype}:`!{target}`",
+            )
+            if not fixed:
+                for pat, repl in ref_fixes(reftype, target):
+                    fixed = resub_in_rst_line(
+                        lines=work.content_lines,
+                        line_num=line - 1,
+                        pat=pat,
+                        repl=repl,
+                        count=1,
+                    )
+                    if fixed:
+                        break
             work.fixed |= fixed
             if not fixed:
-                print(f"Line {line}: Couldn't fix self-link to :{reftype}:`{target}`")
-                print(f"Line was: {work.content_lines[line - 1]!r}")
-        yield LintIssue(line, f"self-link to :{reftype}:`{target}`", fixed=fixed)
+                notes = (
+                    f"Couldn't fix self-link to :{reftype}:`{target}`",
+                    f"Line was: {work.content_lines[line - 1]!r}",
+                )
+        yield LintIssue(line, f"self-link to :{reftype}:`{target}`", fixed=fixed, notes=notes)
 
 
 class RefFinder(nodes.SparseNodeVisitor):
     """Visitor for nodes to track class context and find self-references."""
 
-    def __init__(self, doctree: nodes.document) -> None:
+    def __init__(self, doctree: nodes.document, resolver: Resolver | None = None) -> None:
         super().__init__(doctree)
-        self.resolver = Resolver(doctree)
+        if resolver is None:
+            resolver = Resolver(doctree)
+        self.resolver = resolver
         self.self_refs: list[nodes.Node] = []
         self.class_stack: list[str] = []
         self.pushed_class: list[bool] = []
@@ -138,14 +204,20 @@ class RefFinder(nodes.SparseNodeVisitor):
         self.pushed_module: list[bool] = []
 
     def visit_pending_xref(self, node: addnodes.pending_xref) -> None:
-        line = node_line_number(node)
-        reftype = node.get("reftype")
+        # Every reference comes through here: read the attributes directly.
+        attrs = node.attributes
+        reftype = attrs.get("reftype")
         if reftype in ALWAYS_REF:
             # :ref: references are explicitly meant to be links, so should
             # never be unlinked. I don't know why someone would put a :ref:
             # to its own section, but who are we to judge?
             return
-        target = node.get("reftarget")
+        if reftype not in self.resolver.reftypes:
+            # Nothing in this document could be the target.
+            return
+        line = node_line_number(node)
+        # Sphinx's cross-reference roles always set the target.
+        target = attrs["reftarget"]
 
         if reftype != "mod" and self.module_stack:
             mod_prefix = self.module_stack[-1] + "."
@@ -160,14 +232,10 @@ class RefFinder(nodes.SparseNodeVisitor):
             self.self_refs.append(node)
 
     def visit_section(self, node: nodes.section) -> None:
-        pushed = False
-        section_names = set(node.get("names", []))
-        for section_id in node.get("ids", []):
-            if section_id.startswith("module-") and section_id not in section_names:
-                self.module_stack.append(section_id[len("module-") :])
-                pushed = True
-                break
-        self.pushed_module.append(pushed)
+        module = section_module(node)
+        if module is not None:
+            self.module_stack.append(module)
+        self.pushed_module.append(module is not None)
 
     def depart_section(self, node: nodes.section) -> None:
         if self.pushed_module.pop():
@@ -198,59 +266,104 @@ class RefFinder(nodes.SparseNodeVisitor):
         pass
 
 
-def find_self_refs(doctree: nodes.document) -> Iterable[nodes.Node]:
-    """Find references that point to the same region they are in."""
+def find_self_refs(
+    doctree: nodes.document, resolver: Resolver | None = None
+) -> Iterable[nodes.Node]:
+    """Find references that point to the same region they are in.
+
+    `resolver` is a Resolver for `doctree`, made here if not provided.
+    """
 
-    finder = RefFinder(doctree)
+    finder = RefFinder(doctree, resolver)
+    if not finder.resolver.ref_map:
+        # Nothing in the document can be referred to, so there are no
+        # self-references, and no need to walk the tree looking for them.
+        return []
     doctree.walkabout(finder)
     return finder.self_refs
 
 
-@check("paradup")
+@check("paradup", prefilter=REFERENCE_RE)
 def check_duplicate_refs_in_paragraph(work: LintWork) -> Iterable[LintIssue]:
     """Check references that appear more than once in the same paragraph."""
     if work.fix:
         raise Exception("Fixing is not available for --check=paradup")
 
-    for ref in find_duplicate_refs(work.doctree):
+    for ref in find_duplicate_refs(work.para_refs):
         line = node_line_number(ref)
         reftype = ref.get("reftype")  # type: ignore
         target = ref.get("reftarget")  # type: ignore
         yield LintIssue(line, f"duplicate :{reftype}:`{target}` in paragraph")
 
 
-def find_duplicate_refs(doctree: nodes.document) -> Iterable[nodes.Node]:
-    """Find references that appear more than once in the same paragraph."""
-    for para in doctree.findall(nodes.paragraph):
-        refs_by_target = defaultdict(list)
-        for ref in para.findall(addnodes.pending_xref):
-            reftype = ref.get("reftype")
+def paragraph_refs(doctree: nodes.document) -> dict[nodes.paragraph, list[addnodes.pending_xref]]:
+    """Collect the references in each paragraph, with one walk of the doctree.
+
+    Paragraphs without references are not included.
+    """
+    para_refs = defaultdict(list)
+    # The stack holds (node, the paragraph it's in) pairs.
+    stack: list[tuple[nodes.Node, nodes.paragraph | None]] = [(doctree, None)]
+    while stack:
+        node, para = stack.pop()
+        if isinstance(node, nodes.paragraph):
+            para = node
+        elif para is not None and isinstance(node, addnodes.pending_xref):
+            para_refs[para].append(node)
+        # Text nodes are most of the tree, and never interesting: skip them.
+        stack.extend(
+            (kid, para) for kid in reversed(node.children) if not isinstance(kid, nodes.Text)
+        )
+    return para_refs
+
+
+def find_duplicate_refs(
+    para_refs: dict[nodes.paragraph, list[addnodes.pending_xref]],
+) -> Iterable[nodes.Node]:
+    """Find references that appear more than once in the same paragraph.
+
+    `para_refs` is the result of paragraph_refs().
+    """
+    for para_xrefs in para_refs.values():
+        if len(para_xrefs) < 2:
+            # Most paragraphs have at most one reference, can't be duplicates.
+            continue
+        # Most references are not repeated, so rather than grouping them all
+        # by target, only remember the ones we've seen.
+        seen = set()
+        for ref in para_xrefs:
+            attrs = ref.attributes
+            reftype = attrs.get("reftype")
             if reftype in ALWAYS_REF:
                 # :ref: references are explicitly meant to be links, so should
                 # never be unlinked.
                 continue
-            target = ref.get("reftarget")
+            target = attrs.get("reftarget")
             assert reftype and target, (
                 f"Reference missing reftype or target: {ref}\n{node_traceback(ref)}"
             )
-            refs_by_target[(reftype, target)].append(ref)
+            key = (reftype, target)
+            if key in seen:
+                yield ref
+            else:
+                seen.add(key)
 
-        for refs in refs_by_target.values():
-            if len(refs) > 1:
-                yield from refs[1:]
 
-
-@dataclass
+@dataclass(slots=True)
 class LintResult:
     content: str
     issues: list[LintIssue]
     fixed: bool
 
 
-def lint_content(content: str, fix: bool, checks: set[str]) -> LintResult:
+def lint_content(content: str, fix: bool, checks: Iterable[str]) -> LintResult:
+    checks = [name for name in checks if PREFILTERS[name].search(content)]
+    if not checks:
+        return LintResult(content=content, issues=[], fixed=False)
+
     doctree = parse_rst(content)
     work = LintWork(
-        content_lines=content.splitlines(keepends=True),
+        content_lines=content.splitlines(keepends=True) if fix else [],
         doctree=doctree,
         fix=fix,
         fixed=False,
@@ -261,7 +374,7 @@ def lint_content(content: str, fix: bool, checks: set[str]) -> LintResult:
         issues.extend(CHECKS[check_name](work))
 
     result = LintResult(
-        content="".join(work.content_lines),
+        content="".join(work.content_lines) if fix else content,
         issues=issues,
         fixed=work.fixed,
     )
@@ -5,7 +5,7 @@ from docutils import nodes
 from sphinx import addnodes
 
 
-@dataclass
+@dataclass(slots=True)
 class Region:
     # "module", "class", "function", etc.
     kind: str
@@ -22,53 +22,128 @@ class Region:
         return (self.start, self.name) < (other.start, other.name)
 
 
+MODULE_ID_PREFIX = "module-"
+
+
+def section_module(section: nodes.section) -> str | None:
+    """Get the name of the module declared by a section, if any.
+
+    A `.. module::` directive adds a "module-NAME" id to its section, which
+    isn't also one of the section's names.
+    """
+    for section_id in section.get("ids", []):
+        if section_id.startswith(MODULE_ID_PREFIX):
+            # Only look at the names once we have a candidate: most sections
+            # don't declare a module.
+            if section_id not in section.get("names", []):
+                return section_id.removeprefix(MODULE_ID_PREFIX)
+    return None
+
+
+def newline_counts(node: nodes.Node) -> dict[int, int]:
+    """Count the newlines in node.astext() for every node in a tree.
+
+    The counts are keyed by id(node). They are found bottom-up, so each node
+    only adds up its children, rather than re-joining all of its text.
+    """
+    counts: dict[int, int] = {}
+    # Count the text nodes, and list the elements parents-first.
+    elements = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, nodes.Text):
+            # Text.astext() removes backslash-escapes, which can include newlines.
+            text = node.astext() if "\x00" in node else node
+            counts[id(node)] = text.count("\n")
+        else:
+            elements.append(node)
+            stack.extend(node.children)
+
+    # Then the elements children-first, so their children are already counted.
+    for node in reversed(elements):
+        if type(node).astext is nodes.Element.astext:
+            # Element.astext() joins the children with child_text_separator.
+            kids = node.children
+            count = sum([counts[id(kid)] for kid in kids])
+            if len(kids) > 1:
+                count += node.child_text_separator.count("\n") * (len(kids) - 1)
+            counts[id(node)] = count
+        else:
+            # A few nodes have their own astext(): they are small, so just ask.
+            counts[id(node)] = node.astext().count("\n")
+    return counts
+
+
+@dataclass(slots=True)
+class PartialRegion:
+    """A region whose node is still being walked."""
+
+    kind: str
+    # The (name, start) pairs: a desc can have more than one signature.
+    name_starts: list[tuple[str, int]]
+    end_main: int | None = None
+
+
 class RegionFinder:
     def __init__(self) -> None:
         self.last_line = 0
 
     def find_regions(self, node: nodes.Node) -> Iterable[Region]:
-        kind = None
-        end_main = None
-
-        match node:
-            case nodes.section():
-                section_names = set(node.get("names", []))
-                for section_id in node.get("ids", []):
-                    if section_id.startswith("module-") and section_id not in section_names:
+        # Walk the tree with an explicit stack instead of recursing. Nodes on
+        # the stack are still to be visited. A PartialRegion on the stack is
+        # finished when it's popped, after all of its node's descendants.
+        counts = newline_counts(node)
+        stack: list[nodes.Node | PartialRegion] = [node]
+        # The regions being walked, outermost first.
+        open_regions: list[PartialRegion] = []
+        while stack:
+            item = stack.pop()
+            if isinstance(item, PartialRegion):
+                open_regions.pop()
+                for name, start in item.name_starts:
+                    for outer in reversed(open_regions):
+                        if outer.end_main is not None:
+                            break
+                        # The main part of a region ends when the next region starts.
+                        outer.end_main = start - 1
+                    yield Region(
+                        kind=item.kind,
+                        name=name,
+                        start=start,
+                        end_main=item.end_main or self.last_line,
+                        end_total=self.last_line,
+                    )
+                continue
+
+            node = item
+            kind = None
+            match node:
+                case nodes.section():
+                    module = section_module(node)
+                    if module is not None:
                         kind = "module"
                         assert node.line is not None
-                        name_starts = [(section_id[len("module-") :], node.line - 1)]
-                        break
-
-            case addnodes.desc():
-                if not node.get("no-index", False):
-                    kind = node.get("objtype")
-                    name_starts = [
-                        (kid.get("fullname"), kid.line)
-                        for kid in node.children
-                        if isinstance(kid, addnodes.desc_signature)
-                    ]
-
-        last_line = getattr(node, "line", None)
-        if last_line is not None:
-            self.last_line = last_line + node.astext().count("\n")
-
-        for child in node.children:
-            for subregion in self.find_regions(child):
-                if kind is not None and end_main is None:
-                    # The main part of a region ends when the next region starts.
-                    end_main = subregion.start - 1
-                yield subregion
-
-        if kind is not None:
-            for name, start in name_starts:
-                yield Region(
-                    kind=kind,
-                    name=name,
-                    start=start,
-                    end_main=end_main or self.last_line,
-                    end_total=self.last_line,
-                )
+                        name_starts = [(module, node.line - 1)]
+
+                case addnodes.desc():
+                    if not node.get("no-index", False):
+                        kind = node.get("objtype")
+                        name_starts = [
+                            (kid.get("fullname"), kid.line)
+                            for kid in node.children
+                            if isinstance(kid, addnodes.desc_signature)
+                        ]
+
+            last_line = getattr(node, "line", None)
+            if last_line is not None:
+                self.last_line = last_line + counts[id(node)]
+
+            if kind is not None:
+                partial = PartialRegion(kind, name_starts)
+                open_regions.append(partial)
+                stack.append(partial)
+            stack.extend(reversed(node.children))
 
 
 def find_regions(doctree: nodes.document) -> Iterable[Region]:
@@ -1,16 +1,28 @@
 """Utilities for RST files."""
 
+import atexit
+import contextlib
+import hashlib
 import io
+import os
+import pickle
 import re
+import shutil
 import string
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable
 
-from docutils import nodes
+import docutils
+import sphinx
+from docutils import nodes, utils
 from sphinx.application import Sphinx
+from sphinx.util.docutils import LoggingReporter
 
+from linklint import __version__
 from linklint.dump import dump_doctree
-from linklint.utils import SAVE_INTERMEDIATE, in_tempdir, slug_for_test
+from linklint.utils import SAVE_INTERMEDIATE, USE_CACHE, slug_for_test
 
 
 @dataclass
@@ -49,10 +61,148 @@ def run_sphinx(content: str, buildername: str, extensions: list[str]) -> SphinxR
     return result
 
 
+class SphinxParser:
+    """A Sphinx application kept around to parse many RST documents.
+
+    Creating a Sphinx application is much more expensive than parsing a small
+    document with it, so one application is made and re-used for every parse.
+    """
+
+    def __init__(self, workdir: str) -> None:
+        self.srcdir = Path(workdir)
+        (self.srcdir / "conf.py").write_text("extensions = []\n", encoding="utf-8")
+        (self.srcdir / "index.rst").write_text("", encoding="utf-8")
+        self.status = io.StringIO()
+        self.warning = io.StringIO()
+        self.app = Sphinx(
+            srcdir=self.srcdir,
+            confdir=self.srcdir,
+            outdir=self.srcdir / "_build",
+            doctreedir=self.srcdir / "_build/.doctrees",
+            buildername="dummy",
+            freshenv=True,
+            status=self.status,
+            warning=self.warning,
+        )
+        self.app.connect("source-read", self._source_read)
+        self.content = ""
+
+    def _source_read(self, app: Sphinx, docname: str, source: list[str]) -> None:
+        # Hand Sphinx the content directly, rather than writing it to
+        # index.rst for Sphinx to read back.
+        source[0] = self.content
+
+    def parse(self, content: str) -> nodes.document:
+        """Parse RST content and return the doctree."""
+        self.content = content
+        # index.rst never changes, so make Sphinx read it again.
+        self.app.env.reread_always.add("index")
+        # Don't let the status and warning output pile up.
+        for stream in [self.status, self.warning]:
+            stream.seek(0)
+            stream.truncate()
+        # Only read the document, there's no output to write.
+        self.app.builder.read()
+        # Read back the doctree Sphinx saved, which has had all of the read
+        # transforms applied. The doctree-read event comes before some of them.
+        # env.get_doctree() would do this, but it caches the pickle by docname,
+        # so would return the first document every time.
+        env = self.app.env
+        doctree = pickle.loads((self.srcdir / "_build/.doctrees/index.doctree").read_bytes())
+        doctree.settings.env = env
+        doctree.reporter = LoggingReporter(str(env.doc2path("index")))
+        return doctree
+
+
+_PARSER: SphinxParser | None = None
+
+
+def warmup_parser(workdir: str | None = None) -> None:
+    """Create the shared SphinxParser, if it hasn't been made yet.
+
+    `workdir` is an empty directory the parser can use for its files. If not
+    provided, a temporary directory is made and removed when the process ends.
+    If provided, and the parser uses another directory, a new parser is made:
+    a forked process would otherwise share its parent's directory.
+    """
+    global _PARSER
+    if _PARSER is None or (workdir is not None and _PARSER.srcdir != Path(workdir)):
+        if workdir is None:
+            workdir = tempfile.mkdtemp(prefix="linklint-")
+            atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+        _PARSER = SphinxParser(workdir)
+
+
+# Change this when parsing changes the doctrees, to ignore old cached doctrees.
+CACHE_FORMAT = 1
+
+
+def doctree_cache_path(content: str) -> Path:
+    """Get the file for the cached doctree of `content`."""
+    key = hashlib.blake2b(digest_size=16)
+    # The doctree depends on how linklint parses, and the Sphinx and docutils
+    # versions, as well as the content.
+    versions = [CACHE_FORMAT, __version__, sphinx.__version__, docutils.__version__]
+    key.update(f"{' '.join(map(str, versions))}\n".encode())
+    key.update(content.encode("utf-8"))
+    cache_home = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "linklint" / f"{key.hexdigest()}.doctree"
+
+
+def load_cached_doctree(path: Path) -> nodes.document | None:
+    """Read a doctree saved by save_cached_doctree, or None if there isn't one."""
+    try:
+        data = path.read_bytes()
+        doctree = pickle.loads(data)
+    except Exception:
+        # Missing, truncated, or pickled by incompatible code: parse it again.
+        return None
+    doctree.reporter = utils.new_reporter(str(path), doctree.settings)
+    return doctree
+
+
+def save_cached_doctree(path: Path, doctree: nodes.document) -> None:
+    """Save a doctree to a file for load_cached_doctree.
+
+    The cache is only an optimization: if the file can't be written, nothing is saved.
+    """
+    # Like Sphinx's own doctree files, leave out the parts that can't be
+    # pickled: the reporter, transformer, and the environment in the settings.
+    reporter, transformer, settings = doctree.reporter, doctree.transformer, doctree.settings
+    doctree.reporter = doctree.transformer = None  # type: ignore
+    doctree.settings = settings.copy()
+    doctree.settings.env = None
+    try:
+        data = pickle.dumps(doctree, pickle.HIGHEST_PROTOCOL)
+    finally:
+        doctree.reporter, doctree.transformer, doctree.settings = reporter, transformer, settings
+    # Write to a temporary name then rename, so other processes never see a
+    # partial file.
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            temp_path.unlink()
+
+
 def parse_rst(content: str) -> nodes.document:
-    """Parse RST content using Sphinx and return the doctree."""
-    with in_tempdir():
-        doctree = run_sphinx(content, buildername="dummy", extensions=[]).doctree
+    """Parse RST content using Sphinx and return the doctree.
+
+    If LINKLINT_CACHE=1, doctrees are cached on disk by content.
+    """
+    doctree = None
+    if USE_CACHE:
+        cache_path = doctree_cache_path(content)
+        doctree = load_cached_doctree(cache_path)
+    if doctree is None:
+        warmup_parser()
+        assert _PARSER is not None
+        doctree = _PARSER.parse(content)
+        if USE_CACHE:
+            save_cached_doctree(cache_path, doctree)
     fix_node_lines(doctree)
     if SAVE_INTERMEDIATE:
         save_test_doctree(doctree)
@@ -76,49 +226,95 @@ def fix_node_lines(doctree: nodes.document) -> None:
     inherit the block's start line.  Walk each block's descendants counting
     newlines in text nodes to compute each inline node's actual line.
     """
-    for block in doctree.findall(lambda n: isinstance(n, BLOCK_NODES)):
-        if not block.line:
-            continue
-        newline_count = 0
-        for node in block.findall():
-            if node is block:
-                continue
-            node.line = block.line + newline_count
-            if isinstance(node, nodes.Text):
-                # References are trimmed, so we can miss a trailing newline.
-                # The parent might have better information.
-                if isinstance(node.parent, (nodes.inline, nodes.reference)):
-                    newline_count += node.parent.rawsource.count("\n")
-                else:
-                    newline_count += str(node).count("\n")
+    # Text outside of blocks is never changed, so don't walk into it.
+    stack: list[nodes.Node] = [doctree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BLOCK_NODES) and node.line:
+            fix_block_lines(node)
+        else:
+            stack.extend(kid for kid in node.children if not isinstance(kid, nodes.Text))
+
+
+def fix_block_lines(block: nodes.Element) -> None:
+    """Set the line numbers of a block's descendants, for fix_node_lines."""
+    line = block.line
+    assert line is not None
+    # Children are pushed in reverse, so nodes are visited in document order.
+    stack = list(reversed(block.children))
+    while stack:
+        node = stack.pop()
+        node.line = line
+        if isinstance(node, nodes.Text):
+            # References are trimmed, so we can miss a trailing newline.
+            # The parent might have better information.
+            parent = node.parent
+            if isinstance(parent, (nodes.inline, nodes.reference)):
+                line += parent.rawsource.count("\n")
+            else:
+                line += node.count("\n")
+        else:
+            stack.extend(reversed(node.children))
+
+
+# Characters that can make header underlines and overlines.
+HEADER_CHARS = frozenset(string.punctuation)
 
 
 def is_header_line(line: str, text_line: str) -> bool:
     """Check if a line is a header underline/overline for `text_line`."""
-    stripped = line.rstrip()
+    return is_stripped_header_line(line.rstrip(), len(text_line.rstrip()))
+
+
+def is_stripped_header_line(stripped: str, text_len: int) -> bool:
+    """Like is_header_line, for callers that have already stripped the lines."""
     return (
-        len(stripped) >= len(text_line.rstrip())
-        and len(set(stripped)) == 1
-        and stripped[0] in string.punctuation
+        stripped != ""
+        and len(stripped) >= text_len
+        and stripped[0] in HEADER_CHARS
+        and stripped == stripped[0] * len(stripped)
     )
 
 
 def replace_rst_line(lines: list[str], line_num: int, new_line: str) -> None:
     """Replace a line in the content lines, adjusting header lengths if needed."""
-    old_line = lines[line_num]
+    old_len = len(lines[line_num].rstrip())
+    new_len = len(new_line.rstrip())
     lines[line_num] = new_line
     # Adjust adjacent lines if they are header lines.
     for adj_line_num in [line_num - 1, line_num + 1]:
         if adj_line_num in range(len(lines)):
             adj_line = lines[adj_line_num]
-            if is_header_line(adj_line, old_line):
-                line_end = adj_line[len(adj_line.rstrip()) :]
-                lines[adj_line_num] = adj_line[0] * len(new_line.rstrip()) + line_end
+            adj_stripped = adj_line.rstrip()
+            if is_stripped_header_line(adj_stripped, old_len):
+                line_end = adj_line[len(adj_stripped) :]
+                lines[adj_line_num] = adj_line[0] * new_len + line_end
 
 
-def resub_in_rst_line(lines: list[str], line_num: int, pat: str, repl: str, count=0) -> bool:
-    """Replace a substring in a line, adjusting header lengths if needed."""
-    new_line = re.sub(pat, repl, lines[line_num], count=count)
+def replace_in_rst_line(lines: list[str], line_num: int, olds: Iterable[str], new: str) -> bool:
+    """Replace the first of `olds` in a line with `new`, adjusting header lengths if needed.
+
+    Whichever of `olds` appears earliest in the line is the one replaced.
+    """
+    line = lines[line_num]
+    found = [(start, old) for old in olds if (start := line.find(old)) >= 0]
+    if not found:
+        return False
+    start, old = min(found)
+    replace_rst_line(lines, line_num, line[:start] + new + line[start + len(old) :])
+    return True
+
+
+def resub_in_rst_line(
+    lines: list[str], line_num: int, pat: str | re.Pattern[str], repl: str, count=0
+) -> bool:
+    """Replace a substring in a line, adjusting header lengths if needed.
+
+    `pat` can be a regex string or a compiled pattern.
+    """
+    if isinstance(pat, str):
+        pat = re.compile(pat)
+    new_line = pat.sub(repl, lines[line_num], count=count)
     changed = new_line != lines[line_num]
     if changed:
         replace_rst_line(lines, line_num, new_line)
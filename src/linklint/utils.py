@@ -10,10 +10,17 @@ from docutils import nodes
 # $set_env.py: LINKLINT_SAVE_INTERMEDIATE - Save intermediate data in files for debugging.
 SAVE_INTERMEDIATE = os.getenv("LINKLINT_SAVE_INTERMEDIATE") == "1"
 
+# $set_env.py: LINKLINT_CACHE - Cache parsed doctrees on disk, to skip re-parsing unchanged files.
+USE_CACHE = os.getenv("LINKLINT_CACHE") == "1"
+
 
 def slug_for_test() -> str:  # pragma: debugging
     """Get the short name of the current test, possibly the param id."""
-    test_name = os.getenv("PYTEST_CURRENT_TEST", "unknown")
+    test_name = os.getenv("PYTEST_CURRENT_TEST")
+    if test_name is None:
+        # Not in a test, for example running the command line with
+        # LINKLINT_SAVE_INTERMEDIATE=1.
+        return "unknown"
     m = re.search(r"::(?P<test>[\w_]+)(?P<param>\[.+?\])?(?: \(\w+\))$", test_name)
     assert m is not None
     if param := m["param"]:
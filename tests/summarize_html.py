@@ -1,11 +1,14 @@
 """Summarize an HTML file to see the structure we care about."""
 
-import re
 import sys
 from html.parser import HTMLParser
 from pathlib import Path
 
 
+class MainDone(Exception):
+    """Raised by HtmlSummarizer at the end of the main content."""
+
+
 class HtmlSummarizer(HTMLParser):
     """Summarize an HTML file by keeping only the parts we are interested in.
 
@@ -48,9 +51,7 @@ class HtmlSummarizer(HTMLParser):
     def print(self, s: str, open: bool = False, close: bool = False) -> None:
         if close:
             self.print_indent -= 2
-        self.output.append(" " * self.print_indent)
-        self.output.append(s)
-        self.output.append("\n")
+        self.output.append(f"{' ' * self.print_indent}{s}\n")
         if open:
             self.print_indent += 2
 
@@ -125,17 +126,27 @@ class HtmlSummarizer(HTMLParser):
                     self.ignoring = False
             if self.indent == 0:
                 self.main = False
+                # Nothing after the main content matters, stop parsing.
+                raise MainDone()
 
     def handle_data(self, data: str) -> None:
         if self.main and not self.ignoring:
-            data = re.sub(r"\s+", " ", data.strip())
+            # Collapse whitespace: split() without arguments strips it too.
+            data = " ".join(data.split())
             if data:
                 self.print(data)
 
 
 def summarize_html_file(filename: str) -> str:
+    html = Path(filename).read_text(encoding="utf-8")
+    # Everything before role="main" is ignored, so don't bother parsing it.
+    main = html.find('role="main"')
+    start = html.rfind("<", 0, main) if main >= 0 else 0
     parser = HtmlSummarizer()
-    parser.feed(Path(filename).read_text(encoding="utf-8"))
+    try:
+        parser.feed(html[start:])
+    except MainDone:
+        pass
     return parser.summary()
 
 
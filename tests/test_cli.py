@@ -0,0 +1,153 @@
+"""Tests of the command line."""
+
+import os
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from linklint import cli
+from linklint.cli import linklint, lint_files
+from linklint.linklint import LintIssue, LintResult
+
+
+SELF_LINK_RST = dedent("""\
+    Module
+    ======
+
+    .. module:: {name}
+
+    This is the :mod:`{name}` documentation.
+    """)
+
+CLEAN_RST = dedent("""\
+    Nothing to see here.
+    """)
+
+
+@pytest.fixture
+def rst_files(tmp_path: Path) -> list[str]:
+    """Write some RST files, alternating between self-links and none."""
+    filepaths = []
+    for i in range(6):
+        path = tmp_path / f"file{i}.rst"
+        if i % 2:
+            path.write_text(CLEAN_RST, encoding="utf-8")
+        else:
+            path.write_text(SELF_LINK_RST.format(name=f"mod{i}"), encoding="utf-8")
+        filepaths.append(str(path))
+    return filepaths
+
+
+def expected_issues(filepath: str) -> list[LintIssue]:
+    i = int(Path(filepath).stem.removeprefix("file"))
+    if i % 2:
+        return []
+    return [LintIssue(line=6, message=f"self-link to :mod:`mod{i}`", fixed=False)]
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 100])
+def test_lint_files(rst_files: list[str], jobs: int) -> None:
+    results = list(lint_files(rst_files, fix=False, checks=["self"], jobs=jobs))
+    assert results == [(filepath, expected_issues(filepath)) for filepath in rst_files]
+
+
+def test_lint_files_once(rst_files: list[str], monkeypatch: pytest.MonkeyPatch) -> None:
+    linted = []
+
+    def lint_file(filepath: str, fix: bool, checks: list[str]) -> LintResult:
+        linted.append(filepath)
+        return LintResult(content="", issues=expected_issues(filepath), fixed=False)
+
+    monkeypatch.setattr(cli, "lint_file", lint_file)
+    # The same file, spelled differently.
+    other0 = os.path.join(os.path.dirname(rst_files[0]), ".", "file0.rst")
+    filepaths = [rst_files[0], rst_files[1], other0, rst_files[2], rst_files[1]]
+    results = list(lint_files(filepaths, fix=False, checks=["self"], jobs=1))
+    assert results == [(filepath, expected_issues(filepath)) for filepath in filepaths]
+    assert linted == rst_files[:3]
+
+
+def test_fix_files_once(rst_files: list[str], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(Path(rst_files[0]).parent)
+    filepaths = [rst_files[0], "file0.rst", "./file0.rst", rst_files[2]]
+    results = list(lint_files(filepaths, fix=True, checks=["self"], jobs=2))
+    assert results == [
+        (rst_files[0], [LintIssue(line=6, message="self-link to :mod:`mod0`", fixed=True)]),
+        ("file0.rst", []),
+        ("./file0.rst", []),
+        (rst_files[2], [LintIssue(line=6, message="self-link to :mod:`mod2`", fixed=True)]),
+    ]
+    rst = Path(rst_files[0]).read_text(encoding="utf-8")
+    assert rst == SELF_LINK_RST.format(name="mod0").replace(":mod:`mod0`", ":mod:`!mod0`")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_output_order(rst_files: list[str], jobs: str, capsys: pytest.CaptureFixture[str]) -> None:
+    status = linklint(["--check", "self", "--jobs", jobs, *rst_files])
+    assert status == 1
+    expected = "".join(
+        f"{filepath}:6: self-link to :mod:`mod{i}`\n"
+        for i, filepath in enumerate(rst_files)
+        if i % 2 == 0
+    )
+    expected += "Checked 6 files, found 3 issues.\n"
+    assert capsys.readouterr().out == expected
+
+
+def test_no_issues(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    path = tmp_path / "clean.rst"
+    path.write_text(CLEAN_RST, encoding="utf-8")
+    assert linklint([str(path)]) == 0
+    assert capsys.readouterr().out == "Checked 1 file, found 0 issues.\n"
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_bad_jobs(rst_files: list[str], jobs: str, capsys: pytest.CaptureFixture[str]) -> None:
+    assert linklint([f"--jobs={jobs}", *rst_files]) == 2
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert err == "--jobs must be at least 1\n"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_no_fixes_after_failure(rst_files: list[str], jobs: int) -> None:
+    Path(rst_files[2]).write_bytes(b"Not UTF-8: \xff\n")
+    results = lint_files(rst_files, fix=True, checks=["self"], jobs=jobs)
+    with pytest.raises(UnicodeDecodeError):
+        for _ in results:
+            pass
+    # The file before the failure was fixed, the ones after weren't.
+    rst = Path(rst_files[0]).read_text(encoding="utf-8")
+    assert rst == SELF_LINK_RST.format(name="mod0").replace(":mod:`mod0`", ":mod:`!mod0`")
+    for i in [4, 5]:
+        rst = Path(rst_files[i]).read_text(encoding="utf-8")
+        assert rst == (CLEAN_RST if i % 2 else SELF_LINK_RST.format(name=f"mod{i}"))
+
+
+UNFIXABLE_RST = dedent("""\
+    Module
+    ======
+
+    .. class:: {name}
+
+       .. method:: compare(other: {name})
+    """)
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_fix_notes(tmp_path: Path, jobs: str, capfd: pytest.CaptureFixture[str]) -> None:
+    filepaths = []
+    for name in ["Alpha", "Beta", "Gamma"]:
+        path = tmp_path / f"{name}.rst"
+        path.write_text(UNFIXABLE_RST.format(name=name), encoding="utf-8")
+        filepaths.append(str(path))
+    assert linklint(["--check", "self", "--fix", "--jobs", jobs, *filepaths]) == 1
+    expected = "".join(
+        f"{filepath}:6: self-link to :class:`{name}`\n"
+        + f"{filepath}:6: Couldn't fix self-link to :class:`{name}`\n"
+        + f"{filepath}:6: Line was: '   .. method:: compare(other: {name})\\n'\n"
+        for name, filepath in zip(["Alpha", "Beta", "Gamma"], filepaths)
+    )
+    expected += "Checked 3 files, found 3 issues, fixed 0.\n"
+    assert capfd.readouterr().out == expected
@@ -1,9 +1,10 @@
-from difflib import Differ
+from difflib import SequenceMatcher
 from textwrap import dedent
 from typing import Any
 
 import pytest
 
+from linklint import linklint
 from linklint.linklint import LintIssue, lint_content
 
 from helpers import text_and_id
@@ -11,12 +12,38 @@ from helpers import text_and_id
 
 def diff_lines(text1: str, text2: str) -> str:
     """Return a diff of just the lines that differ between text1 and text2."""
-    differ = Differ().compare(
-        text1.splitlines(keepends=True),
-        text2.splitlines(keepends=True),
-    )
-    min_diff = "".join(line for line in differ if line.startswith(("-", "+")))
-    return min_diff
+    if text1 == text2:
+        return ""
+    lines1 = text1.splitlines(keepends=True)
+    lines2 = text2.splitlines(keepends=True)
+    # Fixes change only a few lines, so only match what's between the
+    # common first and last lines.
+    start = 0
+    while start < min(len(lines1), len(lines2)) and lines1[start] == lines2[start]:
+        start += 1
+    end1, end2 = len(lines1), len(lines2)
+    while end1 > start and end2 > start and lines1[end1 - 1] == lines2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+    lines1 = lines1[start:end1]
+    lines2 = lines2[start:end2]
+    # The opcodes are enough: Differ's fuzzy matching of changed lines is slow
+    # and doesn't change which lines are reported.
+    matcher = SequenceMatcher(a=lines1, b=lines2, autojunk=False)
+    min_diff = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        olds = lines1[i1:i2]
+        news = lines2[j1:j2]
+        if len(olds) == len(news):
+            # Lines changed one for one: show each old line next to its new one.
+            for old, new in zip(olds, news):
+                min_diff.extend(["- " + old, "+ " + new])
+        else:
+            min_diff.extend("- " + line for line in olds)
+            min_diff.extend("+ " + line for line in news)
+    return "".join(min_diff)
 
 
 def lint_test_case(
@@ -620,7 +647,16 @@ SELF_TEST_CASES = [
                   list of :class:`StatisticDiff` instances grouped by *key_type*.
             """,
         issues=[
-            LintIssue(line=10, message="self-link to :class:`Snapshot`", fixed=False),
+            LintIssue(
+                line=10,
+                message="self-link to :class:`Snapshot`",
+                fixed=False,
+                notes=(
+                    "Couldn't fix self-link to :class:`Snapshot`",
+                    "Line was: '   .. method:: compare_to(old_snapshot: Snapshot, key_type: str,"
+                    " cumulative: bool=False)\\n'",
+                ),
+            ),
         ],
     ),
     lint_test_case(
@@ -678,6 +714,22 @@ SELF_TEST_CASES = [
             +    represent sets of sets, the inner sets must be :class:`!frozenset`
         """,
     ),
+    # A directive doesn't have to start a line.
+    lint_test_case(
+        id="list-item-directive",
+        rst="""
+            - .. class:: Foo
+
+                 A :class:`Foo` does things.
+            """,
+        issues=[
+            LintIssue(line=3, message="self-link to :class:`Foo`", fixed=True),
+        ],
+        diff="""
+            -      A :class:`Foo` does things.
+            +      A :class:`!Foo` does things.
+            """,
+    ),
 ]
 
 
@@ -778,3 +830,42 @@ def test_paradup(rst: str, issues: list[LintIssue], diff: str) -> None:
     assert diff == ""
     result = lint_content(rst, fix=False, checks={"paradup"})
     assert result.issues == issues
+
+
+def test_prefilter_finds_directive_in_table_cell() -> None:
+    rst = dedent("""\
+        +-------------------------------+
+        | .. class:: Foo                |
+        |                               |
+        |    A :class:`Foo` does this.  |
+        +-------------------------------+
+        """)
+    result = lint_content(rst, fix=False, checks={"self", "paradup"})
+    assert result.issues == [LintIssue(line=4, message="self-link to :class:`Foo`", fixed=False)]
+
+
+def test_prefilter_finds_directive_with_space() -> None:
+    # Docutils allows one space before the ::.
+    rst = dedent("""\
+        Mod
+        ===
+
+        .. module :: foo
+
+        This is :mod:`foo`.
+        """)
+    result = lint_content(rst, fix=True, checks={"self"})
+    assert result.issues == [LintIssue(line=6, message="self-link to :mod:`foo`", fixed=True)]
+    assert diff_lines(rst, result.content) == "- This is :mod:`foo`.\n+ This is :mod:`!foo`.\n"
+
+
+def test_prefilter_skips_parsing(monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_parse(content: str) -> None:
+        raise AssertionError("content shouldn't have been parsed")
+
+    monkeypatch.setattr(linklint, "parse_rst", no_parse)
+    rst = "Plain text, with *emphasis* and a list:\n\n- one.\n- two.\n"
+    result = lint_content(rst, fix=True, checks={"self", "paradup"})
+    assert result.issues == []
+    assert result.content == rst
+    assert not result.fixed
@@ -1,6 +1,9 @@
+import functools
+
 import pytest
+from docutils import nodes
 
-from linklint.regions import Region, find_regions
+from linklint.regions import Region, find_regions, newline_counts
 from linklint.rsthelp import parse_rst
 
 from helpers import text_and_id
@@ -132,6 +135,20 @@ TEST_CASES = [
 ]
 
 
+@functools.cache
+def parse_rst_once(rst: str) -> nodes.document:
+    """Parse RST, once for all the tests using it. The doctree isn't changed."""
+    return parse_rst(rst)
+
+
 @pytest.mark.parametrize("rst, regions", TEST_CASES)
 def test_regions(rst: str, regions: list[Region]) -> None:
-    assert sorted(find_regions(parse_rst(rst))) == sorted(regions)
+    assert sorted(find_regions(parse_rst_once(rst))) == sorted(regions)
+
+
+@pytest.mark.parametrize("rst", [pytest.param(case.values[0], id=case.id) for case in TEST_CASES])
+def test_newline_counts(rst: str) -> None:
+    doctree = parse_rst_once(rst)
+    counts = newline_counts(doctree)
+    for node in doctree.findall():
+        assert counts[id(node)] == node.astext().count("\n")
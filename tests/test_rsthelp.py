@@ -1,7 +1,22 @@
-from linklint.rsthelp import is_header_line
+from pathlib import Path
+from textwrap import dedent
 
 import pytest
 
+from linklint import rsthelp
+from linklint.linklint import find_self_refs
+from linklint.rsthelp import (
+    doctree_cache_path,
+    fix_node_lines,
+    is_header_line,
+    load_cached_doctree,
+    parse_rst,
+    replace_in_rst_line,
+    run_sphinx,
+    save_cached_doctree,
+)
+from linklint.utils import in_tempdir
+
 
 @pytest.mark.parametrize(
     "hline, is_header",
@@ -15,7 +30,111 @@ import pytest
         ("===========", True),  # Longer is ok
         ("=====-", False),  # Mixed chars
         ("123456", False),  # Not punctuation
+        ("\n", False),  # Blank
     ],
 )
 def test_is_header_line(hline: str, is_header: bool) -> None:
     assert is_header_line(hline, "Header") == is_header
+
+
+@pytest.mark.parametrize(
+    "line, olds, new, result",
+    [
+        ("See :mod:`foo` here\n", [":mod:`foo`"], ":mod:`!foo`", "See :mod:`!foo` here\n"),
+        # The earliest match is replaced, whichever old string it is.
+        ("a :mod:`~foo` :mod:`foo`\n", [":mod:`foo`", ":mod:`~foo`"], "X", "a X :mod:`foo`\n"),
+        ("Nothing here\n", [":mod:`foo`"], "X", None),
+    ],
+)
+def test_replace_in_rst_line(line: str, olds: list[str], new: str, result: str | None) -> None:
+    lines = [line]
+    assert replace_in_rst_line(lines, 0, olds, new) == (result is not None)
+    assert lines == [result or line]
+
+
+def test_replace_in_rst_line_header() -> None:
+    lines = ["==========\n", ":mod:`foo`\n", "==========\n", "\n"]
+    assert replace_in_rst_line(lines, 1, [":mod:`foo`"], ":mod:`!foo`")
+    assert lines == ["===========\n", ":mod:`!foo`\n", "===========\n", "\n"]
+
+
+VERSION_DIRECTIVES_RST = dedent("""\
+    Queue objects
+    -------------
+
+    .. module:: queue
+
+    .. class:: Queue(maxsize=0)
+
+       Constructor for a FIFO queue.
+
+       .. versionchanged:: 3.13
+          Added :class:`Queue` things.
+
+       .. deprecated:: 3.14
+          Use :class:`Queue` instead of :class:`Queue`,
+          and then :class:`Queue`.
+
+       Also see :class:`Queue`.
+    """)
+
+
+def test_parse_rst_matches_full_build() -> None:
+    # Some of Sphinx's read transforms run after the doctree-read event, and
+    # change the inline nodes in versionchanged and deprecated directives. The
+    # shared parser has to give the same doctree, with the same line numbers,
+    # as a full Sphinx build does.
+    doctree = parse_rst(VERSION_DIRECTIVES_RST)
+    with in_tempdir():
+        result = run_sphinx(VERSION_DIRECTIVES_RST, buildername="dummy", extensions=[])
+    expected = result.doctree
+    fix_node_lines(expected)
+    # The documents' source paths differ, so compare what's in them.
+    assert [kid.pformat() for kid in doctree] == [kid.pformat() for kid in expected]
+    assert [node.line for node in doctree.findall()] == [node.line for node in expected.findall()]
+    assert len(list(find_self_refs(doctree))) == 5
+
+
+def test_doctree_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cache_path = doctree_cache_path(VERSION_DIRECTIVES_RST)
+    assert cache_path.parent == tmp_path / "linklint"
+    assert cache_path != doctree_cache_path(VERSION_DIRECTIVES_RST + "\n")
+    assert load_cached_doctree(cache_path) is None
+
+    doctree = parse_rst(VERSION_DIRECTIVES_RST)
+    save_cached_doctree(cache_path, doctree)
+    cached = load_cached_doctree(cache_path)
+    assert cached is not None
+    assert cached.pformat() == doctree.pformat()
+    assert [node.line for node in cached.findall()] == [node.line for node in doctree.findall()]
+    # Saving mustn't have broken the doctree we still have.
+    assert doctree.reporter is not None
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        pytest.param(lambda data: data[: len(data) // 2], id="truncated"),
+        pytest.param(lambda data: b"", id="empty"),
+        pytest.param(lambda data: b"not a pickle", id="garbage"),
+        pytest.param(lambda data: data.replace(b"docutils.nodes", b"docutils.nodez"), id="class"),
+    ],
+)
+def test_damaged_doctree_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, damage) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cache_path = doctree_cache_path(VERSION_DIRECTIVES_RST)
+    save_cached_doctree(cache_path, parse_rst(VERSION_DIRECTIVES_RST))
+    cache_path.write_bytes(damage(cache_path.read_bytes()))
+    assert load_cached_doctree(cache_path) is None
+
+
+def test_unwritable_doctree_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # The cache directory can't be made, because there's a file in the way.
+    (tmp_path / "cache").write_text("not a directory", encoding="utf-8")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(rsthelp, "USE_CACHE", True)
+    doctree = parse_rst(VERSION_DIRECTIVES_RST)
+    assert len(list(find_self_refs(doctree))) == 5
+    assert load_cached_doctree(doctree_cache_path(VERSION_DIRECTIVES_RST)) is None
+    assert list(tmp_path.iterdir()) == [tmp_path / "cache"]